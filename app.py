@@ -1,20 +1,27 @@
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, Response, stream_with_context, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, stream_with_context, redirect, url_for, flash, session
 import os
 import csv
+import logging
 from datetime import datetime
+from itertools import islice
 import webbrowser
 import shutil
+import threading
 
 import fitz  # PyMuPDF
 from PIL import Image
 import io
 
 from app.services.gcdocs import Session as GCDocsSession, GCDocs
-from app.services.sharepoint import SharePointTracker
-from app.services.invoice_repo import InvoiceRepository
+from app.services.sharepoint import SharePointTracker, get_tracker
+from app.utils.json_provider import OrjsonProvider
+from app.processing import warmup
 
 from config import SharePointConfig, GCDocsConfig
 
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
 # Create Flask app first
 app = Flask(
     __name__,
@@ -22,6 +29,7 @@ app = Flask(
     static_folder='app/static'
 )
 app.secret_key = 'very-secret-key-dont-tell-anyone'
+app.json = OrjsonProvider(app)  # jsonify() serializes with orjson
 
 # Now import and register blueprints
 from app.routes.api import api_bp
@@ -33,31 +41,25 @@ app.register_blueprint(api_bp)
 app.register_blueprint(processing_bp)
 
 UPLOAD_FOLDER = 'uploads'
-OUTPUT_FOLDER = 'output'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+EXPORT_CHUNK_ROWS = 500  # Rows serialized per streamed CSV chunk
 
-# Store processed invoice data
-processed_invoices = []
+# Store processed invoice data, keyed by invoice ID
+processed_invoices: dict[int, dict] = {}
 
 # globals for services
 session_global = None
 gcdocs_global = None
-repo_global = None
 sp_tracker_global = None
 
 @app.route('/')
 def index():
-    print(f"Session contents: {session}")
-    print(f"Is authenticated: {'gcdocs_authenticated' in session}")
-    
     # Check if user is logged in AND if GCDOCS is actually configured
     if 'gcdocs_authenticated' not in session or not app.config.get('GCDOCS'):
-        print("Redirecting to login...")
+        logger.debug("Not authenticated, redirecting to login")
         session.clear()  # Clear stale session
         return redirect(url_for('login'))
     
-    print("Rendering index.html")
+    logger.debug("Rendering index.html")
     return render_template('index.html')
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -102,16 +104,16 @@ def logout():
 @app.route('/get_invoice/<int:invoice_id>')
 def get_invoice(invoice_id):
     """Get data for a specific invoice by ID"""
-    if 0 <= invoice_id < len(processed_invoices):
-        return jsonify(processed_invoices[invoice_id])
-    else:
+    inv = processed_invoices.get(invoice_id)
+    if inv is None:
         return jsonify({'error': 'Invoice not found'}), 404
+    return jsonify(inv)
 
 @app.route('/get_all_invoices')
 def get_all_invoices():
     """Get all processed invoices"""
     return jsonify({
-        'invoices': processed_invoices,
+        'invoices': list(processed_invoices.values()),
         'total': len(processed_invoices)
     })
 
@@ -120,8 +122,9 @@ def validate_invoice():
     """Save validated/corrected invoice data and update GCDocs metadata"""
     data = request.json
     invoice_id = data.get('invoice_id')
+    inv = processed_invoices.get(invoice_id)
     
-    if 0 <= invoice_id < len(processed_invoices):
+    if inv is not None:
         # Prepare validated data
         validated_data = {
             'vendor_name': data.get('vendor_name'),
@@ -134,18 +137,45 @@ def validate_invoice():
         notes = data.get('notes', '')
         
         # Update local record
-        processed_invoices[invoice_id]['extracted_data'] = validated_data
-        processed_invoices[invoice_id]['notes'] = notes
-        processed_invoices[invoice_id]['validated'] = True
-        processed_invoices[invoice_id]['flagged'] = flagged
+        inv['extracted_data'] = validated_data
+        inv['notes'] = notes
+        inv['validated'] = True
+        inv['flagged'] = flagged
         
-        # Update GCDocs metadata with human validation
-        filename = processed_invoices[invoice_id]['filename']
-        repo_global.update_human_metadata(
-            filename,
-            validated_data,
-            flagged,
-            notes
+        # Record the human validation in SharePoint; create_or_update_item() also
+        # updates the running counters and drops the cached list items
+        sp_tracker = get_tracker(app.config)
+        if not sp_tracker:
+            return jsonify({"error": "SharePoint not connected"}), 500
+
+        # Local files are named {node_id}_{original_name}.pdf
+        filename = inv['filename']
+        node_id = int(filename.split('_')[0])
+        existing = sp_tracker.get_item_by_node_id(node_id) or {}
+        sp_tracker.create_or_update_item(
+            node_id=node_id,
+            filename=existing.get('Filename', filename),
+            gcdocs_url=existing.get('GCDocsURL', ''),
+            metadata={
+                # Keep the AI results and tracking fields already on the item
+                "ai_invoice_number": existing.get("AI_InvoiceNumber", ""),
+                "ai_company_name": existing.get("AI_CompanyName", ""),
+                "ai_invoice_date": existing.get("AI_InvoiceDate", ""),
+                "ai_total_amount": existing.get("AI_TotalAmount", 0),
+                "ai_confidence": existing.get("AI_Confidence", 0),
+                "ai_processed": existing.get("AI_Processed", False),
+                "ocr_method": existing.get("OCR_Method", ""),
+                "llm_used": existing.get("LLM_Used", ""),
+                "time_taken": existing.get("Time_Taken", ""),
+
+                "human_invoice_number": validated_data['invoice_number'] or '',
+                "human_company_name": validated_data['vendor_name'] or '',
+                "human_invoice_date": validated_data['invoice_date'] or '',
+                "human_total_amount": validated_data['total_amount'],
+                "human_notes": notes,
+                "human_validated": True,
+                "human_flagged": flagged
+            }
         )
         
         return jsonify({'status': 'success'})
@@ -154,68 +184,88 @@ def validate_invoice():
 
 @app.route('/export')
 def export_csv():
-    """Export validated invoices to CSV"""
+    """Export validated invoices to CSV, streamed to the client row by row"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     csv_filename = f'validated_invoices_{timestamp}.csv'
-    csv_path = os.path.join(OUTPUT_FOLDER, csv_filename)
-    
-    # Write CSV
-    with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            'Filename',
-            'Vendor Name',
-            'Invoice Number',
-            'Invoice Date',
-            'Total Amount',
-            'Validated',
-            'Flagged for Review',
-            'Notes',
-            'AI Confidence'
-        ]
-        
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for inv in processed_invoices:
+
+    fieldnames = [
+        'Filename',
+        'Vendor Name',
+        'Invoice Number',
+        'Invoice Date',
+        'Total Amount',
+        'Validated',
+        'Flagged for Review',
+        'Notes',
+        'AI Confidence'
+    ]
+
+    def rows():
+        get = dict.get
+        for inv in processed_invoices.values():
             data = inv['extracted_data']
-            writer.writerow({
-                'Filename': inv['filename'],
-                'Vendor Name': data.get('vendor_name', ''),
-                'Invoice Number': data.get('invoice_number', ''),
-                'Invoice Date': data.get('invoice_date', ''),
-                'Total Amount': data.get('total_amount', ''),
-                'Validated': 'Yes' if inv['validated'] else 'No',
-                'Flagged for Review': 'Yes' if inv.get('flagged', False) else 'No',
-                'Notes': inv.get('notes', ''),
-                'AI Confidence': inv.get('confidence_scores', {}).get('overall', '')
-            })
-    
-    return send_file(
-        csv_path,
+            yield (
+                inv['filename'],
+                get(data, 'vendor_name', ''),
+                get(data, 'invoice_number', ''),
+                get(data, 'invoice_date', ''),
+                get(data, 'total_amount', ''),
+                'Yes' if inv['validated'] else 'No',
+                'Yes' if get(inv, 'flagged', False) else 'No',
+                get(inv, 'notes', ''),
+                get(inv, 'confidence_scores', {}).get('overall', '')
+            )
+
+    def generate():
+        # One small buffer is reused for every chunk instead of building the file on disk
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def drain():
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return chunk
+
+        writer.writerow(fieldnames)
+        yield drain()
+
+        row_iter = rows()
+        while True:
+            chunk = list(islice(row_iter, EXPORT_CHUNK_ROWS))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            yield drain()
+
+    return Response(
+        stream_with_context(generate()),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name=csv_filename
+        headers={'Content-Disposition': f'attachment; filename={csv_filename}'}
     )
 
 @app.route('/uploads/<path:filename>')
 def serve_uploaded_file(filename):
     return send_from_directory('uploads', filename)
 
+def _sharepoint_connecting():
+    """True while the startup SharePoint login is still running"""
+    ready = app.config.get('SHAREPOINT_READY')
+    return ready is not None and not ready.is_set()
+
 @app.route('/status')
 def get_status():
-    """Get processing status from GCDocs"""
-    all_invoices = repo_global.get_all_invoices(include_processed=True)
-    
-    ai_processed = sum(1 for inv in all_invoices if inv['ai_processed'])
-    human_validated = sum(1 for inv in all_invoices if inv['human_validated'])
-    pending = len(all_invoices) - ai_processed
-    
-    return jsonify({
-        'total': len(all_invoices),
-        'ai_processed': ai_processed,
-        'human_validated': human_validated,
-        'pending': pending
-    })
+    """Get processing status from the running SharePoint list counters"""
+    # Polled by the UI: answer right away instead of waiting out the login
+    if _sharepoint_connecting():
+        return jsonify({"status": "connecting"}), 503
+    sp_tracker = get_tracker(app.config)
+    if not sp_tracker:
+        return jsonify({"error": "SharePoint not connected"}), 500
+
+    counters = sp_tracker.get_counters()
+    counters['pending'] = counters['total'] - counters['ai_processed']
+    return jsonify(counters)
 
 @app.route("/sync_to_sharepoint", methods=["GET"])
 def stream_sync():
@@ -228,7 +278,7 @@ def stream_sync():
         
         # Get services from app.config
         gcdocs = app.config.get('GCDOCS')
-        sp_tracker = app.config.get('SHAREPOINT_TRACKER')
+        sp_tracker = get_tracker(app.config)
         
         if not gcdocs:
             yield "data: ❌ Error: GCDocs not connected. Please login.\n\n"
@@ -257,26 +307,48 @@ def stream_sync():
 @app.route('/sharepoint_stats')
 def sharepoint_stats():
     try:
-        sp_tracker = app.config.get('SHAREPOINT_TRACKER')
+        if _sharepoint_connecting():
+            return jsonify({"status": "connecting"}), 503
+        sp_tracker = get_tracker(app.config)
         if not sp_tracker:
             return jsonify({"error": "SharePoint not connected"}), 500
             
-        items = sp_tracker.get_all_items()
-        total = len(items)
-        ai_processed = sum(1 for i in items if i.get("AI_Processed"))
-        human_validated = sum(1 for i in items if i.get("Human_Validated"))
-        return jsonify({
-            "total": total,
-            "ai_processed": ai_processed,
-            "human_validated": human_validated
-        })
+        return jsonify(sp_tracker.get_counters())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def start_app():
+def _init_sharepoint():
+    """Log in to SharePoint and seed the list counters, off the server startup path"""
     global sp_tracker_global
 
+    try:
+        print("Connecting to SharePoint...")
+        tracker = SharePointTracker(
+            SharePointConfig.SP_SITE_NAME,
+            SharePointConfig.SP_LIST_NAME,
+            SharePointConfig.TENANT_NAME
+        )
+        tracker.login()  # browser auth
+        all_items = tracker.get_all_items()
+        tracker.refresh_counters(all_items)
+        print(f"✓ Connected to SharePoint - Total items in list: {len(all_items)}")
+
+        # Store in app.config so routes can access it
+        sp_tracker_global = tracker
+        app.config['SHAREPOINT_TRACKER'] = tracker
+    except Exception as e:
+        print(f"❌ SharePoint connection failed: {e}")
+    finally:
+        app.config['SHAREPOINT_READY'].set()
+
+def start_app():
+    # Only ever start one server/SharePoint login per process, even if re-entered
+    if app.config.get('_STARTED'):
+        return
+    app.config['_STARTED'] = True
+
     print("Starting Invoice AI...")
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
     # --- Clear temp folder ---
     temp_dir = os.path.join(os.path.dirname(__file__), 'temp')
@@ -295,19 +367,12 @@ def start_app():
         os.makedirs(temp_dir)
         print(f"Created temp folder: {temp_dir}")
 
-    # --- Setup SharePoint ---
-    sp_site_name = SharePointConfig.SP_SITE_NAME
-    sp_list_name = SharePointConfig.SP_LIST_NAME
-    tenant_name = SharePointConfig.TENANT_NAME
-
-    print("Connecting to SharePoint...")
-    sp_tracker_global = SharePointTracker(sp_site_name, sp_list_name, tenant_name)
-    sp_tracker_global.login()  # browser auth
-    all_items = sp_tracker_global.get_all_items()
-    print(f"✓ Connected to SharePoint - Total items in list: {len(all_items)}")
+    # --- Load OCR and the LLM in the background so the first invoice doesn't wait on them ---
+    warmup()
 
-    # Store in app.config so routes can access it
-    app.config['SHAREPOINT_TRACKER'] = sp_tracker_global
+    # --- Setup SharePoint in the background; routes that need it wait for SHAREPOINT_READY ---
+    app.config['SHAREPOINT_READY'] = threading.Event()
+    threading.Thread(target=_init_sharepoint, daemon=True).start()
 
     url = "http://localhost:5000"
     print(f"Starting web server...\n📱 Opening {url} in your default browser...")
@@ -315,8 +380,13 @@ def start_app():
     # Open the browser
     webbrowser.open(url, new=2)  # new=2 -> open in a new tab, if possible
 
-    # Start Flask server
-    app.run(debug=True, use_reloader=False, port=5000)
+    # Start server: waitress (multi-threaded, so SSE streams and LLM calls don't block
+    # other requests) unless explicitly running the Flask development server
+    if os.environ.get('FLASK_ENV') == 'development':
+        app.run(debug=True, use_reloader=False, port=5000)
+    else:
+        from waitress import serve
+        serve(app, host='127.0.0.1', port=5000, threads=8)
 
 if __name__ == "__main__":
     start_app()
\ No newline at end of file
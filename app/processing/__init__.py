@@ -0,0 +1,41 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_ocr():
+    from app.processing.ocr import get_ocr_reader, get_text_detector, warm_background_worker
+    from config import OCRConfig
+
+    # Pages 2-N are OCR'd in a worker process with its own engine; load it too
+    if OCRConfig.MAX_OCR_PAGES > 1:
+        warm_background_worker()
+    get_ocr_reader()
+    # The DPI probe runs on every scanned document's first page
+    if OCRConfig.ADAPTIVE_DPI:
+        get_text_detector()
+
+
+def _warm_llm():
+    from app.processing.extraction import LLMExtractor
+
+    # Loading the pooled contexts maps the weights in and prefills the prompt prefix
+    LLMExtractor()
+
+
+def warmup():
+    """
+    Load PaddleOCR and the default LLM in parallel background threads, so the
+    first invoice doesn't pay either cold start. Failures are only logged; the
+    first request then loads them lazily as before.
+    """
+    def run(name, target):
+        try:
+            target()
+            logger.info("✅ %s warmed up", name)
+        except Exception as e:
+            logger.warning("⚠️ %s warm-up failed: %s", name, e)
+
+    for name, target in (("OCR", _warm_ocr), ("LLM", _warm_llm)):
+        threading.Thread(target=run, args=(name, target), daemon=True).start()
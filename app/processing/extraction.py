@@ -1,16 +1,376 @@
-from llama_cpp import Llama
+import llama_cpp
+from llama_cpp import Llama, LlamaGrammar
+import codecs
+import os
+import hashlib
+import logging
 import json
+import orjson
 import re
+import psutil
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
 from json_repair import repair_json
 from dateutil import parser
 
+from app.processing.extraction_cache import ExtractionCache
 from config import AIConfig
 
+logger = logging.getLogger(__name__)
+
+
+def _split_template(template: str, *fields: str) -> tuple:
+    """Split a str.format template into its literal segments around ``fields``"""
+    parts = []
+    for field in fields:
+        head, template = template.split("{%s}" % field, 1)
+        parts.append(head)
+    parts.append(template)
+    return tuple(part.replace("{{", "{").replace("}}", "}") for part in parts)
+
+
+# 4/5-bit K-quants roughly double CPU token throughput over FP16/Q8 weights.
+# GGUF general.file_type values for Q4_K_S, Q4_K_M, Q5_K_S and Q5_K_M.
+_K_QUANT_FILE_TYPES = {'14', '15', '16', '17'}
+
+class _AmountChars(dict):
+    """
+    str.translate table that keeps only digits, '.' and '-' ("$1,250.50 CAD" -> "1250.50").
+
+    Any other code point (including non-Latin-1 ones like '€') maps to None, i.e.
+    is deleted; each is looked up once and then cached in the dict itself.
+    """
+
+    def __missing__(self, codepoint):
+        kept = codepoint if chr(codepoint) in '0123456789.-' else None
+        self[codepoint] = kept
+        return kept
+
+
+_AMOUNT_CHARS = _AmountChars()
+
+# OCR/PDF text often carries non-breaking and thin spaces; map them to plain
+# spaces in one C-level pass so the space-run collapse below catches them
+_SPACE_TRANSLATION = str.maketrans({'\u00a0': ' ', '\u2009': ' ', '\u202f': ' '})
+
+# Whitespace runs collapsed before prompting to save tokens
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_SPACE_RUN_RE = re.compile(r' {2,}')
+
+# Dates the model already returned in the target format skip dateutil entirely
+_ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+# Common invoice date layouts, tried with strptime before falling back to dateutil.
+# Month-first precedes day-first so ambiguous dates resolve the way dateutil does.
+_DATE_FORMATS = (
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%Y/%m/%d',
+    '%d %b %Y',
+    '%d %B %Y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+)
+
+# A markdown code fence anywhere in the response, e.g. "Here you go: ```json {...} ```"
+# (the closing fence is usually missing because decoding ends at the object's closing brace)
+_FENCE_RE = re.compile(r'(?:```|~~~)(?:json)?\s*(.*?)\s*(?:```|~~~|\Z)', re.DOTALL)
+
+# Static prompt text is split once at import; each call only splices in the OCR text
+_FULL_PAGE_PREFIX, _FULL_PAGE_SUFFIX = _split_template(
+    AIConfig.INVOICE_EXTRACTION_PROMPT_FULL_PAGE, "full_text"
+)
+_SLICED_PREFIX, _SLICED_MIDDLE, _SLICED_SUFFIX = _split_template(
+    AIConfig.INVOICE_EXTRACTION_PROMPT, "header_slice", "footer_slice"
+)
+
+# Header+footer slicing only pays off once the slices no longer overlap; shorter
+# text is always sent once, whole, via the full page prompt
+_SLICE_THRESHOLD = max(AIConfig.MAX_PAGE_CHARS, AIConfig.HEADER_SIZE + AIConfig.FOOTER_SIZE)
+
+# Stop at the first sign of trailing commentary; the closing brace itself is
+# detected while decoding (a "}" stop string would also fire inside a value).
+# "```" is deliberately absent: it would fire on an opening fence before the object.
+_STOP_SEQUENCES = ["###", "\n\n"]
+
+# GBNF grammar forcing exactly the four invoice keys, so the sampler can only
+# emit well-formed JSON and never wastes tokens on fences or commentary. The
+# date is generated directly as YYYY-MM-DD (or null)
+_INVOICE_GBNF = r'''
+root   ::= "{" ws "\"invoice_number\":" ws string "," ws "\"company_name\":" ws string "," ws "\"invoice_date\":" ws date "," ws "\"total_amount\":" ws number ws "}"
+string ::= "\"" ( [^"\\\x7F\x00-\x1F] | "\\" ["\\/bfnrt] )* "\""
+number ::= "-"? [0-9]+ ("." [0-9]+)?
+date   ::= "\"" [12] [0-9] [0-9] [0-9] "-" [01] [0-9] "-" [0-3] [0-9] "\"" | "null"
+ws     ::= " "?
+'''
+_INVOICE_GRAMMAR = LlamaGrammar.from_string(_INVOICE_GBNF, verbose=False) if AIConfig.USE_GRAMMAR else None
+
+# Changes whenever the prompts, grammar or decoding settings do, so cached
+# extractions from an older prompt are never served
+_PROMPT_VERSION = hashlib.sha256(repr((
+    AIConfig.INVOICE_EXTRACTION_PROMPT_FULL_PAGE,
+    AIConfig.INVOICE_EXTRACTION_PROMPT,
+    _INVOICE_GBNF if AIConfig.USE_GRAMMAR else None,
+    _SLICE_THRESHOLD, AIConfig.HEADER_SIZE, AIConfig.FOOTER_SIZE,
+    AIConfig.MAX_TOKENS, AIConfig.TEMPERATURE, _STOP_SEQUENCES,
+)).encode("utf-8")).hexdigest()[:12]
+
+
+def _physical_cores() -> int:
+    """Physical core count; SMT siblings only contend for the same matmul units"""
+    return psutil.cpu_count(logical=False) or os.cpu_count() or 4
+
+
+class _JsonObjectScanner:
+    """
+    Incremental, string-aware brace-depth scanner.
+
+    Text can be fed in pieces (e.g. streamed tokens); ``feed`` returns the offset
+    just past the closing brace of the first complete object, or -1 until then.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.start = -1
+        self.pos = 0
+        self.in_string = self.escaped = False
+
+    def feed(self, text: str) -> int:
+        for c in text:
+            self.pos += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == '\\':
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = self.depth > 0
+            elif c == '{':
+                if self.depth == 0:
+                    self.start = self.pos - 1
+                self.depth += 1
+            elif c == '}' and self.depth:
+                self.depth -= 1
+                if self.depth == 0:
+                    return self.pos
+        return -1
+
+
+def _slice_json(text: str):
+    """Return the first balanced ``{...}`` object in ``text`` (ignoring braces inside strings), or None"""
+    scanner = _JsonObjectScanner()
+    end = scanner.feed(text)
+    return text[scanner.start:end] if end >= 0 else None
+
+
+def _find_stop(text: str, n_new: int) -> int:
+    """Index of the earliest stop sequence touching the last ``n_new`` chars of ``text``, or -1"""
+    hits = [
+        i for i in (text.find(stop, max(0, len(text) - n_new - len(stop) + 1)) for stop in _STOP_SEQUENCES)
+        if i >= 0
+    ]
+    return min(hits) if hits else -1
+
+
+def _save_debug_prompt(prompt: str):
+    """Write the last prompt sent to the LLM to temp/prompt.txt"""
+    try:
+        debug_path = Path("temp")
+        debug_path.mkdir(parents=True, exist_ok=True)
+        with open(debug_path / "prompt.txt", "w", encoding="utf-8") as f:
+            f.write(prompt)
+    except OSError:
+        pass
+
+
+class _ModelContext:
+    """One loaded Llama context plus its prefilled prompt-prefix snapshots"""
+
+    def __init__(self, model_path: Path, n_ctx: int):
+        # Offload to GPU (CUDA/Metal/ROCm) when llama.cpp was built with support for it
+        if llama_cpp.llama_supports_gpu_offload():
+            n_gpu_layers = AIConfig.N_GPU_LAYERS
+        else:
+            n_gpu_layers = 0
+        # Pooled contexts decode in parallel, so they split the cores between them
+        n_threads_batch = AIConfig.N_THREADS or max(1, _physical_cores() // max(1, AIConfig.LLM_POOL_SIZE))
+        # Token-by-token decode is memory-bandwidth bound and stops scaling before the
+        # last core; leave that core to the web server and OCR threads
+        n_threads = max(1, n_threads_batch - 1) if not AIConfig.N_THREADS else n_threads_batch
+
+        # q8_0 keys/values halve KV cache memory traffic; llama.cpp only supports a
+        # quantized V cache with flash attention enabled
+        if AIConfig.QUANTIZE_KV_CACHE:
+            kv_cache_args = dict(
+                type_k=llama_cpp.GGML_TYPE_Q8_0,
+                type_v=llama_cpp.GGML_TYPE_Q8_0,
+                flash_attn=True
+            )
+        else:
+            kv_cache_args = {}
+
+        logger.info("Loading model from: %s (gpu_layers=%d, threads=%d/%d)",
+                    model_path, n_gpu_layers, n_threads, n_threads_batch)
+        self.llm = Llama(
+            model_path=str(model_path),
+            n_ctx=n_ctx,
+            n_batch=AIConfig.N_BATCH,  # Large prefill batches for fast prompt processing
+            n_ubatch=AIConfig.N_UBATCH,
+            n_threads=n_threads,
+            n_threads_batch=n_threads_batch,  # Compute-bound prompt prefill uses every core
+            n_gpu_layers=n_gpu_layers,
+            use_mmap=True,  # Page weights in on demand instead of reading the whole file up front
+            use_mlock=False,
+            verbose=False,
+            **kv_cache_args
+        )
+
+        # Prefilled KV snapshots of the static instruction prefixes, keyed by prefix
+        # text. llama.cpp reuses the matching KV cache on every later call so only
+        # the invoice text needs evaluating. The full page prefix is primed up
+        # front; the sliced one on first use.
+        self.prefix_cache = {}
+        self.prime_prefix(_FULL_PAGE_PREFIX)
+
+    def prime_prefix(self, prefix: str):
+        """Tokenize a static prompt prefix, prefilling and snapshotting its KV cache if enabled"""
+        tokens = self.llm.tokenize(prefix.encode("utf-8"), special=True)
+        state = None
+        if AIConfig.PREFIX_KV_CACHE:
+            self.llm.reset()
+            self.llm.eval(tokens)
+            state = self.llm.save_state()
+        self.prefix_cache[prefix] = (tokens, state)
+
+    def restore_prefix(self, prefix: str):
+        """Load the prefilled ``prefix`` unless the KV cache already starts with it"""
+        if prefix not in self.prefix_cache:
+            self.prime_prefix(prefix)
+            return
+
+        tokens, state = self.prefix_cache[prefix]
+        if state is None:
+            return  # Snapshots disabled; llama.cpp still reuses whatever prefix matches
+
+        n_prefix = len(tokens)
+        if (self.llm.n_tokens < n_prefix
+                or self.llm.input_ids[:n_prefix].tolist() != tokens):
+            self.llm.load_state(state)
+
+    def prompt_tokens(self, prefix: str, segments: tuple) -> list:
+        """
+        Token ids for ``prefix`` followed by ``segments``.
+
+        The whole prompt goes through one tokenize call, exactly as llama.cpp
+        tokenizes a prompt string. Tokenizing segments separately is not
+        equivalent: SPM vocabularies (Mistral's included) add a space prefix at
+        the start of every call, and tokens can merge across segment boundaries.
+        Only the prefix is tokenized once and cached, for its KV snapshot;
+        llama.cpp reuses however much of it the full prompt's tokens share.
+        """
+        return self.llm.tokenize((prefix + ''.join(segments)).encode("utf-8"), special=True)
+
+    def fits(self, prompt_tokens: list) -> bool:
+        """Whether ``prompt_tokens`` plus a full-length answer fit the context window"""
+        return len(prompt_tokens) + AIConfig.MAX_TOKENS <= self.llm.n_ctx()
+
+    def complete(self, prompt_tokens: list) -> str:
+        """
+        Greedy-decode a completion of ``prompt_tokens`` with llama.cpp's low-level
+        generate loop (no per-token completion chunks, logprobs or usage bookkeeping).
+
+        Decoding stops the moment the first JSON object closes, which is then
+        returned on its own; otherwise at a stop sequence, EOS or MAX_TOKENS.
+        """
+        if not self.fits(prompt_tokens):
+            raise ValueError(f"Prompt of {len(prompt_tokens)} tokens does not fit the "
+                             f"{self.llm.n_ctx()}-token context")
+
+        eos = self.llm.token_eos()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        scanner = _JsonObjectScanner()
+        text = ""
+
+        generator = self.llm.generate(
+            prompt_tokens,
+            temp=AIConfig.TEMPERATURE,
+            top_k=1,  # Only the top candidate survives; skips top-p/min-p sampling work
+            repeat_penalty=1.0,
+            grammar=_INVOICE_GRAMMAR
+        )
+        try:
+            for n_generated, token in enumerate(generator, 1):
+                if token == eos:
+                    break
+                piece = decoder.decode(self.llm.detokenize([token]))
+                text += piece
+
+                end = scanner.feed(piece)
+                if end >= 0:
+                    return text[scanner.start:end]
+
+                stop_at = _find_stop(text, len(piece))
+                if stop_at >= 0:
+                    return text[:stop_at]
+
+                if n_generated >= AIConfig.MAX_TOKENS:
+                    break
+        finally:
+            generator.close()
+        return text
+
+
+def _check_quantization(model_path: Path, llm: Llama):
+    # The file name says nothing reliable (SETUP.bat saves a Q4_K_M download as
+    # mistral-7b.gguf), so read the quantization from the GGUF header
+    file_type = str(llm.metadata.get('general.file_type', ''))
+    if file_type and file_type not in _K_QUANT_FILE_TYPES:
+        logger.warning("⚠️ %s is not a Q4_K/Q5_K quantization (GGUF file type %s) - "
+                       "a Q4_K_M build is roughly 2x faster on CPU (see README)",
+                       model_path.name, file_type)
+
+
+# Loaded model contexts live for the whole process, keyed by (model path, n_ctx).
+# Each pool holds AIConfig.LLM_POOL_SIZE warm contexts; a caller takes one for a
+# single extraction and puts it back, so concurrent requests never share a context.
+_context_pools = {}
+_context_pools_lock = threading.Lock()
+
+
+def _get_context_pool(model_path: Path, n_ctx: int) -> queue.Queue:
+    key = (str(model_path), n_ctx)
+    with _context_pools_lock:
+        pool = _context_pools.get(key)
+        if pool is None:
+            pool_size = max(1, AIConfig.LLM_POOL_SIZE)
+            pool = queue.Queue(maxsize=pool_size)
+            for _ in range(pool_size):
+                pool.put(_ModelContext(model_path, n_ctx))
+            _check_quantization(model_path, pool.queue[0].llm)
+            _context_pools[key] = pool
+    return pool
+
+
+# One result cache per process, so its in-memory layer outlives each request's extractor
+_extraction_cache = None
+
+
+def _get_extraction_cache():
+    global _extraction_cache
+    if _extraction_cache is None and AIConfig.EXTRACTION_CACHE:
+        cache_dir = Path(__file__).resolve().parent.parent / 'cache' / 'extraction'
+        _extraction_cache = ExtractionCache(cache_dir, memory_size=AIConfig.EXTRACTION_CACHE_MEMORY_SIZE)
+    return _extraction_cache
+
+
 class LLMExtractor:
-    def __init__(self, model_filename: str = None):
+    def __init__(self, model_filename: str = None, n_ctx: int = None):
         # Use config values
-        n_ctx = AIConfig.CTX_SIZE
+        n_ctx = n_ctx or AIConfig.CTX_SIZE
         model_filename = model_filename or AIConfig.MODEL_PATH
 
         app_root = Path(__file__).resolve().parent.parent
@@ -23,21 +383,40 @@ class LLMExtractor:
         self.n_ctx = n_ctx
         self.model_name = model_filename
 
-        print(f"Loading model from: {model_path}")
-        self.llm = Llama(
-            model_path=str(model_path),
-            n_ctx=n_ctx,
-            n_batch=1024,  # Fast prompt processing
-            n_threads=4,
-            n_gpu_layers=0,
-            verbose=False
-        )
+        # Only the first extractor for a model pays the load; later ones reuse it
+        self._pool = _get_context_pool(model_path, n_ctx)
+
+        self._cache = _get_extraction_cache()
+
+    def _sanitize_amount(self, raw_amount) -> float:
+        # Grammar-constrained output is already a JSON number; only strings need cleaning
+        if isinstance(raw_amount, (int, float)) and not isinstance(raw_amount, bool):
+            return float(raw_amount)
+        text = str(raw_amount or '').strip()
+        # Accounting-style negatives: "(1,250.50)"
+        negative = text.startswith('(') and text.endswith(')')
+        try:
+            amount = float(text.translate(_AMOUNT_CHARS) or 0)
+        except ValueError:
+            return 0.0
+        return -amount if negative else amount
 
     def _sanitize_date(self, date_str: str) -> str:
         if not date_str:
             return None
+        date_str = str(date_str).strip()
+        if _ISO_DATE_RE.fullmatch(date_str):
+            try:
+                return date.fromisoformat(date_str).isoformat()
+            except ValueError:
+                pass  # Out-of-range parts; let dateutil have a go
+        for fmt in _DATE_FORMATS:
+            try:
+                return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                pass
         try:
-            dt = parser.parse(str(date_str))
+            dt = parser.parse(date_str)
             return dt.strftime('%Y-%m-%d')
         except Exception:
             return None
@@ -45,10 +424,13 @@ class LLMExtractor:
     def _clean_ocr_text(self, text: str) -> str:
         """Compress whitespace to save tokens"""
         if not text: return ""
-        # Replace 3+ newlines with 2
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = text.translate(_SPACE_TRANSLATION)
+        # Replace 3+ newlines with 2 (the substring test is far cheaper than a regex scan)
+        if '\n\n\n' in text:
+            text = _BLANK_LINES_RE.sub('\n\n', text)
         # Remove multiple spaces
-        text = re.sub(r' {2,}', ' ', text)
+        if '  ' in text:
+            text = _SPACE_RUN_RE.sub(' ', text)
         return text.strip()
 
     def extract_invoice_data(self, ocr_result) -> dict:
@@ -57,7 +439,7 @@ class LLMExtractor:
             ocr_text = ocr_result.get("full_text", "")
             ocr_method = ocr_result.get("method", "unknown")
         elif isinstance(ocr_result, list):
-            ocr_text = "\n".join([item.get("text", "") if isinstance(item, dict) else str(item) for item in ocr_result])
+            ocr_text = "\n".join(item.get("text", "") if isinstance(item, dict) else str(item) for item in ocr_result)
             ocr_method = "list_format"
         else:
             ocr_text = str(ocr_result)
@@ -69,73 +451,132 @@ class LLMExtractor:
 
         # Clean the text
         ocr_text = self._clean_ocr_text(ocr_text)
+
+        # Same text, model and prompt as an earlier run: reuse its result
+        if self._cache is not None:
+            cached = self._cache.get(ocr_text, self.model_name, _PROMPT_VERSION)
+            if cached is not None:
+                logger.debug("⚡ Extraction cache hit: %s | $%s", cached.get('company_name'), cached.get('total_amount'))
+                cached['ocr_method'] = ocr_method
+                return cached
         total_len = len(ocr_text)
 
-        print(f"📊 Using full page text: {total_len} chars")
+        logger.debug("📊 Using full page text: %d chars", total_len)
         
         # Check if text exceeds maximum page size
-        if total_len > AIConfig.MAX_PAGE_CHARS:
-            print(f"⚠️ Text exceeds {AIConfig.MAX_PAGE_CHARS} chars, using smart slicing fallback")
+        if total_len > _SLICE_THRESHOLD:
+            logger.debug("⚠️ Text exceeds %d chars, using smart slicing fallback", _SLICE_THRESHOLD)
             # Fallback to header+footer if page is abnormally large
-            header_slice = ocr_text[:AIConfig.HEADER_SIZE]
-            footer_slice = ocr_text[-AIConfig.FOOTER_SIZE:]
-            
-            prompt = AIConfig.INVOICE_EXTRACTION_PROMPT.format(
-                header_slice=header_slice,
-                footer_slice=footer_slice
-            )
+            prefix, segments = self._sliced_prompt(ocr_text)
         else:
             # Use FULL page text directly from config
-            prompt = AIConfig.INVOICE_EXTRACTION_PROMPT_FULL_PAGE.format(full_text=ocr_text)
+            prefix = _FULL_PAGE_PREFIX
+            segments = (ocr_text, _FULL_PAGE_SUFFIX)
 
-        # Debug save
         try:
-            debug_path = Path("temp")
-            debug_path.mkdir(parents=True, exist_ok=True)
-            with open(debug_path / "prompt.txt", "w", encoding="utf-8") as f:
-                f.write(prompt)
-        except: 
-            pass
+            context = self._pool.get()
+            try:
+                context.restore_prefix(prefix)
+                prompt_tokens = context.prompt_tokens(prefix, segments)
 
-        print(f"📤 Sending prompt to LLM ({len(prompt)} chars)")
+                # Dense text can be under the char threshold yet over the token
+                # budget; slice it rather than failing the invoice
+                if prefix is _FULL_PAGE_PREFIX and not context.fits(prompt_tokens):
+                    logger.debug("⚠️ Full page is %d tokens, too long for the context; "
+                                 "using smart slicing fallback", len(prompt_tokens))
+                    prefix, segments = self._sliced_prompt(ocr_text)
+                    context.restore_prefix(prefix)
+                    prompt_tokens = context.prompt_tokens(prefix, segments)
 
-        try:
-            response = self.llm(
-                prompt,
-                max_tokens=AIConfig.MAX_TOKENS,
-                temperature=AIConfig.TEMPERATURE,
-                stop=["\n\n\n", "```", "}"],  # Stop at JSON closing brace
-                echo=False
-            )
-            output_text = response['choices'][0]['text'].strip()
-            
-            # If we stopped at '}', add it back for valid JSON
+                # Debug save (off the extraction path)
+                if AIConfig.DEBUG_SAVE_PROMPT:
+                    prompt = prefix + ''.join(segments)
+                    threading.Thread(target=_save_debug_prompt, args=(prompt,), daemon=True).start()
+
+                logger.debug("📤 Sending prompt to LLM (%d tokens)", len(prompt_tokens))
+
+                output_text = context.complete(prompt_tokens).strip()
+            finally:
+                self._pool.put(context)
+
+            # Ran out of tokens before the object closed: give the parser a chance
             if not output_text.endswith("}"):
                 output_text += "}"
 
-            return self._parse_output(output_text, ocr_method)
+            result = self._parse_output(output_text, ocr_method)
+            if self._cache is not None and 'error' not in result:
+                self._cache.put(ocr_text, self.model_name, _PROMPT_VERSION, result)
+            return result
 
         except Exception as e:
-            print(f"❌ AI Error: {e}")
+            logger.error("❌ AI Error: %s", e)
             return self._return_empty_error(ocr_method, str(e))
 
+    @staticmethod
+    def _sliced_prompt(ocr_text: str) -> tuple:
+        """Header+footer prompt prefix and segments for text too long to send whole"""
+        header_slice = ocr_text[:AIConfig.HEADER_SIZE]
+        footer_slice = ocr_text[-AIConfig.FOOTER_SIZE:]
+        return _SLICED_PREFIX, (header_slice, _SLICED_MIDDLE, footer_slice, _SLICED_SUFFIX)
+
+    def extract_batch(self, ocr_results: list) -> list:
+        """
+        Extract several invoices on the warm model context(s).
+
+        Invoices that use the same prompt template are queued consecutively so the
+        prefilled prefix is reused across the batch. With more than one pooled
+        context (AIConfig.LLM_POOL_SIZE) the invoices run concurrently, one per
+        context. Results keep input order.
+        """
+        def uses_full_page(ocr_result):
+            text = ocr_result.get("full_text", "") if isinstance(ocr_result, dict) else ""
+            return len(text) <= _SLICE_THRESHOLD
+
+        order = sorted(range(len(ocr_results)), key=lambda i: not uses_full_page(ocr_results[i]))
+        results = [None] * len(ocr_results)
+
+        workers = min(self._pool.maxsize, len(order))
+        if workers <= 1:
+            for i in order:
+                results[i] = self.extract_invoice_data(ocr_results[i])
+            return results
+
+        # llama.cpp releases the GIL while evaluating, so threads give real overlap
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {i: executor.submit(self.extract_invoice_data, ocr_results[i]) for i in order}
+            for i, future in futures.items():
+                results[i] = future.result()
+        return results
+
     def _parse_output(self, output_text, ocr_method):
         """Separated parsing logic for cleanliness"""
         try:
-            # Remove markdown fences
-            clean_text = output_text.replace("```json", "").replace("```", "").strip()
+            # Remove markdown fences (a bare object can't be fenced, so skip the scan)
+            clean_text = output_text.strip()
+            if not clean_text.startswith('{'):
+                fenced = _FENCE_RE.search(clean_text)
+                if fenced:
+                    clean_text = fenced.group(1)
             
-            # Repair JSON
-            repaired = repair_json(clean_text)
-            data = json.loads(repaired)
+            # Well-formed (grammar-constrained) output parses directly; the fallbacks
+            # only run when decoding was unconstrained
+            try:
+                data = orjson.loads(clean_text)
+            except orjson.JSONDecodeError:
+                data = None
+                # Commentary around an intact object: cut out the object itself
+                sliced = _slice_json(clean_text)
+                if sliced is not None:
+                    try:
+                        data = json.loads(sliced)
+                    except json.JSONDecodeError:
+                        pass
+                # Malformed or truncated object: last-resort repair
+                if data is None:
+                    data = json.loads(repair_json(clean_text))
 
             # Sanitize Amount
-            try:
-                raw_amount = str(data.get('total_amount', 0))
-                clean_amount = re.sub(r'[^\d.-]', '', raw_amount)
-                data['total_amount'] = float(clean_amount)
-            except:
-                data['total_amount'] = 0.0
+            data['total_amount'] = self._sanitize_amount(data.get('total_amount', 0))
             
             # Sanitize Date
             data['invoice_date'] = self._sanitize_date(data.get('invoice_date', ''))
@@ -145,11 +586,11 @@ class LLMExtractor:
             data['model_used'] = self.model_name
             data['ocr_method'] = ocr_method
             
-            print(f"✅ Extracted: {data['company_name']} | ${data['total_amount']}")
+            logger.info("✅ Extracted: %s | $%s", data['company_name'], data['total_amount'])
             return data
             
         except Exception as e:
-            print(f"❌ Parse Error: {e}")
+            logger.error("❌ Parse Error: %s", e)
             return self._return_empty_error(ocr_method, f"Parse failed: {e}")
 
     def _return_empty_error(self, method, error_msg):
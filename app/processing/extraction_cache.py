@@ -0,0 +1,78 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of LLM extraction results.
+
+    Entries are keyed by sha256(ocr_text) + model + prompt version, so a re-run,
+    retry or duplicate upload of the same invoice skips the LLM entirely, while
+    any change to the model or prompt misses the old entries. Recent entries are
+    also held in a bounded in-memory LRU in front of the JSON files on disk.
+    """
+
+    def __init__(self, cache_dir: Path, memory_size: int = 512):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, ocr_text: str, model_name: str, prompt_version: str) -> str:
+        digest = hashlib.sha256(ocr_text.encode("utf-8")).hexdigest()
+        return f"{digest}_{model_name}_{prompt_version}"
+
+    def _remember(self, key: str, result: dict):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, ocr_text: str, model_name: str, prompt_version: str):
+        """Return (a copy of) the cached result dict, or None on a miss"""
+        key = self._key(ocr_text, model_name, prompt_version)
+
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                return dict(result)
+
+        try:
+            with open(self.cache_dir / f"{key}.json", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, result)
+        return dict(result)
+
+    def put(self, ocr_text: str, model_name: str, prompt_version: str, result: dict):
+        key = self._key(ocr_text, model_name, prompt_version)
+        self._remember(key, dict(result))
+
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = None
+        try:
+            # A unique temp file per write: pooled extraction threads can store the same key
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)  # Readers never see a half-written entry
+        except OSError as e:
+            logger.warning("⚠️ Could not write extraction cache entry: %s", e)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
@@ -51,7 +51,9 @@ class FileConverter:
     @staticmethod
     def _excel_to_pdf(excel_path: str, pdf_path: str) -> str:
         """Convert Excel to PDF using openpyxl + reportlab"""
-        wb = openpyxl.load_workbook(excel_path, data_only=True)
+        # read_only streams rows straight from the sheet XML instead of building
+        # every cell object up front
+        wb = openpyxl.load_workbook(excel_path, data_only=True, read_only=True)
         
         c = canvas.Canvas(pdf_path, pagesize=letter)
         width, height = letter
@@ -63,28 +65,32 @@ class FileConverter:
             c.setFont("Helvetica-Bold", 14)
             c.drawString(50, height - 50, f"Sheet: {sheet_name}")
             
-            y_position = height - 100
-            c.setFont("Helvetica", 9)
+            text = FileConverter._begin_text(c, height - 100, "Helvetica", 9, 15)
             
             # Extract data from cells
-            for row_idx, row in enumerate(sheet.iter_rows(values_only=True), 1):
-                if y_position < 50:  # New page if needed
+            for row in sheet.iter_rows(values_only=True):
+                # Skip blank rows (formatting often extends sheets far past the data)
+                if all(cell is None for cell in row):
+                    continue
+
+                if text.getY() < 50:  # New page if needed
+                    c.drawText(text)
                     c.showPage()
-                    y_position = height - 50
-                    c.setFont("Helvetica", 9)
+                    text = FileConverter._begin_text(c, height - 50, "Helvetica", 9, 15)
                 
-                row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
+                row_text = " | ".join("" if cell is None else str(cell) for cell in row)
                 
                 # Truncate long rows
                 if len(row_text) > 100:
                     row_text = row_text[:100] + "..."
                 
-                c.drawString(50, y_position, row_text)
-                y_position -= 15
+                text.textLine(row_text)
             
+            c.drawText(text)
             c.showPage()  # New page for next sheet
         
         c.save()
+        wb.close()  # Read-only workbooks keep the file open until closed
         print(f"✅ Excel converted to PDF: {pdf_path}")
         return pdf_path
     
@@ -119,26 +125,33 @@ class FileConverter:
     @staticmethod
     def _text_to_pdf(text_path: str, pdf_path: str) -> str:
         """Convert text/CSV file to PDF"""
-        with open(text_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
         c = canvas.Canvas(pdf_path, pagesize=letter)
         width, height = letter
         
-        c.setFont("Courier", 9)  # Monospace for alignment
-        y_position = height - 50
+        # Monospace for alignment
+        text = FileConverter._begin_text(c, height - 50, "Courier", 9, 12)
         
-        for line in lines:
-            if y_position < 50:
-                c.showPage()
-                y_position = height - 50
-                c.setFont("Courier", 9)
-            
-            # Truncate very long lines
-            line = line.rstrip()[:120]
-            c.drawString(50, y_position, line)
-            y_position -= 12
+        with open(text_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if text.getY() < 50:
+                    c.drawText(text)
+                    c.showPage()
+                    text = FileConverter._begin_text(c, height - 50, "Courier", 9, 12)
+                
+                # Truncate very long lines
+                text.textLine(line.rstrip()[:120])
         
+        c.drawText(text)
         c.save()
         print(f"✅ Text/CSV converted to PDF: {pdf_path}")
-        return pdf_path
\ No newline at end of file
+        return pdf_path
+
+    @staticmethod
+    def _begin_text(c, y: float, font: str, size: int, leading: int):
+        """
+        Start a text object at the left margin. Lines added to it are written as one
+        block of PDF text operators by c.drawText() instead of one drawString per line.
+        """
+        text = c.beginText(50, y)
+        text.setFont(font, size, leading=leading)
+        return text
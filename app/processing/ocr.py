@@ -1,130 +1,435 @@
 # app/processing/ocr.py
+import os
+
+# Skip PaddleX's connectivity check of the model hosters on every engine start
+# (worker processes included); models are still downloaded when missing
+os.environ.setdefault("PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK", "True")
+
+import paddleocr
 from paddleocr import PaddleOCR
-from PIL import Image
+import cv2
+import numpy as np
 import fitz  # PyMuPDF
-import os
-import json
-import gc
+import hashlib
+import logging
 import time
 import threading
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import Dict, List
 
+from app.processing.ocr_cache import OCRCache
 from config import OCRConfig
+from app.utils.pdf_utils import extract_page_texts
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+logger = logging.getLogger(__name__)
+
+_OCR_VERSION = "PP-OCRv4"
+_DET_MODEL_NAME = "PP-OCRv4_mobile_det"
+
 _ocr_engine = None
+# Warmup and request threads can both ask for a model first; build each only once
+_model_init_lock = threading.Lock()
+
+def _create_model(cls, **kwargs):
+    """
+    Build a PaddleOCR pipeline/model, with high-performance inference (automatic
+    OpenVINO/ONNX Runtime/TensorRT backend selection) when enabled. HPI needs its
+    extra dependencies installed; without them we fall back to Paddle Inference.
+    """
+    if OCRConfig.ENABLE_HPI:
+        try:
+            return cls(enable_hpi=True, **kwargs)
+        except Exception as e:
+            logger.warning("⚠️ High-performance inference unavailable (%s), using Paddle Inference", e)
+    return cls(**kwargs)
+
 
 def get_ocr_reader():
     """Lazy initialization using YOUR EXACT CONFIGURATION"""
     global _ocr_engine
-    if _ocr_engine is None:
-        print("🔧 Initializing PaddleOCR (User Config)...")
-        _ocr_engine = PaddleOCR(
-            lang="en",
-            ocr_version="PP-OCRv4",
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False
-        )
-        print("✅ PaddleOCR initialized")
+    if _ocr_engine is not None:
+        return _ocr_engine
+    with _model_init_lock:
+        if _ocr_engine is None:
+            logger.info("🔧 Initializing PaddleOCR (User Config)...")
+            engine = _create_model(
+                PaddleOCR,
+                lang="en",
+                ocr_version=_OCR_VERSION,
+                use_doc_orientation_classify=False,
+                use_doc_unwarping=False,
+                use_textline_orientation=False,  # Invoice lines are upright; skip the extra classifier
+                text_recognition_batch_size=OCRConfig.REC_BATCH_SIZE
+            )
+            # One tiny predict loads the det/rec weights and builds the inference
+            # graphs now, instead of on the first real page
+            engine.predict(input=np.zeros((64, 64, 3), dtype=np.uint8))
+            _ocr_engine = engine
+            logger.info("✅ PaddleOCR initialized")
     return _ocr_engine
 
 
-def _process_single_page(ocr, page, page_num: int, temp_dir: str) -> Dict:
+def _pixmap_to_array(pix) -> np.ndarray:
+    """Convert a rendered gray or RGB pixmap to the BGR uint8 array PaddleOCR takes in memory"""
+    # samples_mv views the pixmap's own buffer (pix.samples would copy it into a new
+    # bytes object); the view only has to outlive cvtColor, which writes a new array
+    img = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR if pix.n == 1 else cv2.COLOR_RGB2BGR)
+
+
+def _render_page(page, dpi: int) -> np.ndarray:
+    """Render one PDF page for OCR"""
+    # Large-format pages (drawings, scanned A3 sheets) would render to huge images at
+    # the document DPI; cap their longest side, but never below MIN_DPI
+    longest_side_pts = max(page.rect.width, page.rect.height)
+    max_dpi = max(OCRConfig.MIN_DPI, int(OCRConfig.MAX_RENDER_SIDE_PX * 72 / longest_side_pts))
+    if dpi > max_dpi:
+        logger.debug("    Page %d is large format, rendering at %d DPI instead of %d",
+                     page.number + 1, max_dpi, dpi)
+        dpi = max_dpi
+    
+    # No alpha bytes to render, copy or strip. Black-on-white invoices render in
+    # one gray channel (a third of the RGB bytes); the models still get 3 channels
+    colorspace = fitz.csGRAY if OCRConfig.GRAYSCALE_RENDER else fitz.csRGB
+    return _pixmap_to_array(page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False))
+
+
+_text_detector = None
+
+def get_text_detector():
+    """Lazy initialization of the standalone text detector used for the DPI probe"""
+    global _text_detector
+    if _text_detector is not None:
+        return _text_detector
+    with _model_init_lock:
+        if _text_detector is None:
+            from paddleocr import TextDetection
+            _text_detector = _create_model(TextDetection, model_name=_DET_MODEL_NAME)
+    return _text_detector
+
+
+def _median_line_height(polys) -> float:
+    """Median height in pixels of detected text boxes (0.0 when there are none)"""
+    polys = np.asarray(polys)
+    if not len(polys):
+        return 0.0
+    return float(np.median(polys[:, :, 1].max(axis=1) - polys[:, :, 1].min(axis=1)))
+
+
+def _needs_upscale(polys, dpi: int) -> bool:
+    """True when a page's recognized text came out too small to trust at this DPI"""
+    if dpi >= OCRConfig.MAX_DPI:
+        return False
+    line_height = _median_line_height(polys)
+    return 0 < line_height < OCRConfig.SMALL_TEXT_HEIGHT_PX
+
+
+def _choose_dpi(page) -> int:
+    """
+    Pick the render DPI for a document from its first page. A cheap low-DPI
+    detection pass measures the median text line height, and the DPI is scaled so
+    lines come out around OCRConfig.TARGET_TEXT_HEIGHT_PX tall: large-font
+    invoices render with far fewer pixels, dense small print gets more.
+    """
+    if not OCRConfig.ADAPTIVE_DPI:
+        return OCRConfig.RENDER_DPI
+    
+    try:
+        probe = get_text_detector().predict(input=_render_page(page, OCRConfig.PROBE_DPI))[0]
+        polys = np.asarray(probe["dt_polys"])
+    except Exception as e:
+        logger.warning("⚠️ DPI probe failed (%s), using %d DPI", e, OCRConfig.RENDER_DPI)
+        return OCRConfig.RENDER_DPI
+    
+    line_height = _median_line_height(polys)
+    if line_height <= 0:
+        return OCRConfig.RENDER_DPI
+    
+    dpi = int(OCRConfig.PROBE_DPI * OCRConfig.TARGET_TEXT_HEIGHT_PX / line_height)
+    return max(OCRConfig.MIN_DPI, min(OCRConfig.MAX_DPI, dpi))
+
+
+# Box arrays for pages that have no OCR boxes (native PDF text)
+_NO_BOXES = np.empty((0, 4, 2), dtype=np.int32)
+_NO_SCORES = np.empty(0, dtype=np.float32)
+
+
+def _parse_page_result(res, page_num: int) -> Dict:
+    """Turn one PaddleOCR page result into structured page data"""
+    # OCRResult is a dict; reading it directly skips res.json, which converts the
+    # whole result (every array included) to plain Python objects first
+    try:
+        rec_texts = res['rec_texts']
+        dt_polys = res['dt_polys']
+        rec_scores = res['rec_scores']
+    except (KeyError, TypeError):
+        rec_texts = dt_polys = rec_scores = []
+    
+    # Page data is kept as parallel arrays (texts / bboxes / scores) rather than a
+    # dict per box
+    keep = [i for i, t in enumerate(rec_texts) if t]
+    texts = [rec_texts[i] for i in keep]
+    
+    return {
+        "page_num": page_num + 1,
+        "texts": texts,
+        "bboxes": np.asarray(dt_polys, dtype=np.int32).reshape(-1, 4, 2)[keep],
+        "scores": np.asarray(rec_scores, dtype=np.float32)[keep],
+        "text": "\n".join(texts)
+    }
+
+
+def _det_size_args(imgs: List[np.ndarray]) -> Dict:
+    """
+    Per-call detector sizing. Pages up to DET_MAX_SIDE_PX are detected at the
+    resolution they were rendered at instead of the model config's own limit;
+    larger renders are scaled down to it, since the DB detector's cost grows with
+    pixel count and box finding doesn't need full resolution. Recognition always
+    crops the lines from the full-resolution page.
+    """
+    longest_side = max(max(img.shape[:2]) for img in imgs)
+    return {"text_det_limit_side_len": min(longest_side, OCRConfig.DET_MAX_SIDE_PX),
+            "text_det_limit_type": "max"}
+
+
+def _process_single_page(ocr, page, page_num: int, dpi: int) -> Dict:
     """Process a single page and return structured data"""
     loop_start = time.time()
     
-    pix = page.get_pixmap(dpi=200)
-    img_path = os.path.join(temp_dir, f"proc_p{page_num}_{int(time.time() * 1000)}.png")
-    pix.save(img_path)
-    pix = None
+    # Rendered pixels go straight to PaddleOCR; no PNG encode/decode or temp file
+    img = _render_page(page, dpi)
+    page_data = _parse_page_result(ocr.predict(input=img, **_det_size_args([img]))[0], page_num)
     
-    try:
-        result = ocr.predict(input=img_path)
-        
-        page_data = {
-            "page_num": page_num + 1,
-            "blocks": [],
-            "text": ""
-        }
-        
-        page_text_lines = []
-        
-        for res in result:
-            try:
-                json_data = res.json
-                if isinstance(json_data, dict) and 'res' in json_data:
-                    ocr_data = json_data['res']
-                    rec_texts = ocr_data.get('rec_texts', [])
-                    dt_polys = ocr_data.get('dt_polys', [])
-                    rec_scores = ocr_data.get('rec_scores', [])
-                    
-                    for i, text_content in enumerate(rec_texts):
-                        if text_content:
-                            block = {
-                                "text": text_content,
-                                "bbox": dt_polys[i] if i < len(dt_polys) else [],
-                                "confidence": float(rec_scores[i]) if i < len(rec_scores) else 0.0
-                            }
-                            page_data["blocks"].append(block)
-                            page_text_lines.append(text_content)
-            except Exception:
-                continue
-        
-        page_text = "\n".join(page_text_lines)
-        page_data["text"] = page_text
-        
-        proc_time = time.time() - loop_start
-        print(f"    ✓ Page {page_num + 1}: {len(page_text)} chars ({proc_time:.2f}s)")
-        
-        return page_data
-        
-    finally:
-        if os.path.exists(img_path):
-            try: 
-                os.remove(img_path)
-            except: 
-                pass
+    # Small print that slipped past the DPI choice gets one re-OCR at full resolution
+    if _needs_upscale(page_data["bboxes"], dpi):
+        logger.debug("    ↻ Page %d: small text, re-OCR at %d DPI", page_num + 1, OCRConfig.MAX_DPI)
+        img = _render_page(page, OCRConfig.MAX_DPI)
+        page_data = _parse_page_result(ocr.predict(input=img, **_det_size_args([img]))[0], page_num)
+    
+    proc_time = time.time() - loop_start
+    logger.debug("    ✓ Page %d: %d chars (%.2fs)", page_num + 1, len(page_data['text']), proc_time)
+    
+    return page_data
 
 
-def _background_ocr_worker(doc, ocr, start_page: int, end_page: int, 
-                          temp_dir: str, results_container: Dict):
-    """Background worker that processes pages 2-N"""
+_bg_executor = None
+_bg_executor_lock = threading.Lock()
+
+def _get_background_executor() -> ProcessPoolExecutor:
+    """
+    Lazily start the OCR worker processes. PaddleOCR is CPU-bound and its engine
+    isn't thread-safe, so pages 2-N run in their own processes (each with its own
+    engine) and actually overlap the page 1 LLM call instead of contending for the
+    GIL. Workers are spawned, not forked, so they never inherit Paddle's threads.
+    """
+    global _bg_executor
+    with _bg_executor_lock:
+        if _bg_executor is None:
+            _bg_executor = ProcessPoolExecutor(
+                max_workers=max(1, OCRConfig.OCR_WORKERS),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _bg_executor
+
+
+def _warm_worker():
+    get_ocr_reader()
+
+
+def warm_background_worker():
+    """Start the OCR worker processes and load their engines before the first multi-page invoice"""
+    executor = _get_background_executor()
+    for _ in range(max(1, OCRConfig.OCR_WORKERS)):
+        executor.submit(_warm_worker)
+
+
+def _pages_per_batch(page, dpi: int) -> int:
+    """
+    How many pages like this one fit in one batch once rendered. Up to three
+    batches are in memory at once (one being recognized, one queued, one being
+    rendered), so each gets a third of OCRConfig.OCR_BATCH_MEM_MB.
+    """
+    page_bytes = (page.rect.width * dpi / 72) * (page.rect.height * dpi / 72) * 3
+    return max(1, int(OCRConfig.OCR_BATCH_MEM_MB * 1_000_000 // 3 // max(page_bytes, 1)))
+
+
+def _ocr_pages(ocr, doc, page_nums: List[int], dpi: int) -> List[Dict]:
+    """
+    OCR the given pages at ``dpi`` and return their page data in page order.
+
+    Pages go to PaddleOCR in batched predict calls, so it fills its det/rec
+    batches instead of paying per-call overhead page by page. Each batch is
+    capped by the render memory budget (an A4 page at 300 DPI is ~25 MB of
+    pixels). A render thread prepares the next batch while the current one is
+    being recognized; it is the only thread that touches ``doc`` meanwhile.
+    """
+    batch_size = _pages_per_batch(doc[page_nums[0]], dpi)
+    batches = [page_nums[b:b + batch_size] for b in range(0, len(page_nums), batch_size)]
+    rendered = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    
+    def render():
+        for batch in batches:
+            try:
+                imgs = [_render_page(doc[page_num], dpi) for page_num in batch]
+            except Exception as e:
+                imgs = e
+            while not stop.is_set():
+                try:
+                    rendered.put(imgs, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set() or isinstance(imgs, Exception):
+                return
+    
+    renderer = threading.Thread(target=render, daemon=True)
+    renderer.start()
+    
+    pages = []
     try:
-        print(f"🔄 Background OCR worker starting (pages {start_page+1}-{end_page})...")
-        
-        for page_num in range(start_page, end_page):
-            page = doc[page_num]
-            page_data = _process_single_page(ocr, page, page_num, temp_dir)
+        for batch in batches:
+            imgs = rendered.get()
+            if isinstance(imgs, Exception):
+                raise imgs
             
-            # Thread-safe append to results
-            results_container["pages"].append(page_data)
-            results_container["full_text"] += f"\n\n--- PAGE {page_num + 1} ---\n{page_data['text']}"
-        
-        results_container["background_complete"] = True
-        print(f"✅ Background OCR complete ({end_page - start_page} pages)")
+            # Feed same-sized pages next to each other (e.g. a landscape schedule among
+            # portrait pages) so batched tensors aren't padded out to the largest page.
+            # Within a page, PaddleOCR already orders text crops by width for recognition.
+            order = sorted(range(len(imgs)), key=lambda i: imgs[i].shape[:2])
+            batch_pages = [None] * len(order)
+            results = ocr.predict(input=[imgs[i] for i in order], **_det_size_args(imgs))
+            for i, res in zip(order, results):
+                batch_pages[i] = _parse_page_result(res, batch[i])
+            imgs = None
+            
+            pages.extend(batch_pages)
+    finally:
+        # The caller closes doc afterwards, so the renderer must be done with it
+        stop.set()
+        renderer.join()
+    
+    return pages
+
+
+def _background_ocr_worker(pdf_path: str, start_page: int, end_page: int, dpi: int) -> List[Dict]:
+    """Worker process entry point: OCR pages 2-N from its own handle on the PDF"""
+    logger.debug("🔄 Background OCR worker starting (pages %d-%d)...", start_page + 1, end_page)
+    ocr = get_ocr_reader()
+    
+    batch_start = time.time()
+    with fitz.open(pdf_path) as doc:
+        page_nums = list(range(start_page, end_page))
+        pages = _ocr_pages(ocr, doc, page_nums, dpi)
+        logger.debug("    ✓ Pages %d-%d recognized (%.2fs)", start_page + 1, end_page, time.time() - batch_start)
         
+        # Small print that slipped past the DPI choice gets one re-OCR at full resolution
+        small = [i for i, page_data in enumerate(pages) if _needs_upscale(page_data["bboxes"], dpi)]
+        if small:
+            logger.debug("    ↻ %d page(s) with small text, re-OCR at %d DPI", len(small), OCRConfig.MAX_DPI)
+            redone = _ocr_pages(ocr, doc, [page_nums[i] for i in small], OCRConfig.MAX_DPI)
+            for i, page_data in zip(small, redone):
+                pages[i] = page_data
+    
+    return pages
+
+
+_collect_lock = threading.Lock()
+
+def _collect_background_pages(future, results_container: Dict):
+    """Done-callback: merge one worker's pages into the caller's OCR results"""
+    try:
+        pages = future.result()
     except Exception as e:
-        print(f"❌ Background OCR error: {e}")
+        logger.error("❌ Background OCR error: %s", e)
         results_container["background_error"] = str(e)
+        return
+    
+    # Each page has its own pre-allocated slot, so pages land in order and no
+    # shared string is rebuilt per page; wait_for_background_ocr joins the text
+    for page_data in pages:
+        i = page_data["page_num"] - 1
+        results_container["pages"][i] = page_data
+        results_container["_text_parts"][i] = f"--- PAGE {i + 1} ---\n{page_data['text']}"
+    
+    # Complete once the last of the document's page ranges is in
+    with _collect_lock:
+        results_container["_pending_ranges"] -= 1
+        done = results_container["_pending_ranges"] == 0
+    if done:
+        results_container["background_complete"] = True
+        logger.info("✅ Background OCR complete (%d pages)", len(results_container["pages"]) - 1)
+
+
+def _native_text_results(page_texts: List[str], method: str) -> Dict:
+    """Build OCR-shaped results from the PDF's embedded text layer"""
+    ocr_results = {
+        "method": method,
+        "pages": [],
+        "total_pages": len(page_texts),
+        "full_text": "",
+        "background_complete": True  # Native extraction is synchronous
+    }
+    all_text_parts = []
+    
+    for i, page_text in enumerate(page_texts):
+        page_data = {"page_num": i+1, "text": page_text, "texts": [], "bboxes": _NO_BOXES, "scores": _NO_SCORES}
+        ocr_results["pages"].append(page_data)
+        all_text_parts.append(f"--- PAGE {i + 1} ---\n{page_text}")
+    
+    ocr_results["full_text"] = "\n\n".join(all_text_parts)
+    return ocr_results
+
+
+_result_cache = None
+
+# Changes whenever the models or the settings that shape OCR output do, so text
+# recognized under older settings is never served
+_OCR_SETTINGS_VERSION = hashlib.sha256(repr((
+    paddleocr.__version__, _OCR_VERSION, _DET_MODEL_NAME, OCRConfig.ENABLE_HPI,
+    OCRConfig.NATIVE_TEXT_THRESHOLD, OCRConfig.RENDER_DPI, OCRConfig.ADAPTIVE_DPI,
+    OCRConfig.PROBE_DPI, OCRConfig.TARGET_TEXT_HEIGHT_PX, OCRConfig.SMALL_TEXT_HEIGHT_PX,
+    OCRConfig.MIN_DPI, OCRConfig.MAX_DPI, OCRConfig.MAX_RENDER_SIDE_PX, OCRConfig.DET_MAX_SIDE_PX,
+    OCRConfig.GRAYSCALE_RENDER,
+)).encode("utf-8")).hexdigest()[:12]
+
+def _get_result_cache():
+    global _result_cache
+    if _result_cache is None and OCRConfig.RESULT_CACHE:
+        cache_dir = Path(__file__).resolve().parent.parent / 'cache' / 'ocr'
+        _result_cache = OCRCache(cache_dir, max_bytes=OCRConfig.RESULT_CACHE_MAX_MB * 1024 * 1024)
+    return _result_cache
 
 
 def perform_ocr(pdf_path: str, preprocess: bool = True, max_pages: int = None) -> dict:
     """
     OPTIMIZED: Process page 1 immediately, background-process rest
     
-    Returns immediately with page 1 data, spawns background thread for pages 2-N
+    Returns immediately with page 1 data, hands pages 2-N to the OCR worker process
     """
     if max_pages is None:
         max_pages = OCRConfig.MAX_OCR_PAGES
 
-    print(f"\n📄 Starting OPTIMIZED OCR on: {pdf_path}")
+    logger.info("📄 Starting OPTIMIZED OCR on: %s", pdf_path)
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"File not found: {pdf_path}")
 
+    # Retries and duplicate uploads of the same file reuse the earlier results
+    cache = _get_result_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.file_key(pdf_path, max_pages, _OCR_SETTINGS_VERSION)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("⚡ OCR cache hit, skipping OCR")
+            return cached
+
     doc = None 
-    temp_dir = os.path.join(os.getcwd(), "temp")
-    os.makedirs(temp_dir, exist_ok=True)
 
     ocr_results = {
         "method": "paddleocr_optimized",
@@ -140,39 +445,74 @@ def perform_ocr(pdf_path: str, preprocess: bool = True, max_pages: int = None) -
         total_pages = doc.page_count
         pages_to_process = min(total_pages, max_pages)
         ocr_results["total_pages"] = pages_to_process
+        ocr_results["pages"] = [None] * pages_to_process
+        ocr_results["_text_parts"] = [None] * pages_to_process
+        
+        # ========================================================================
+        # STEP 0: Digital PDFs already carry their text - skip OCR entirely
+        # ========================================================================
+        first_page_text = doc[0].get_text("text")
+        native_chars = len(first_page_text.strip())
+        if native_chars > OCRConfig.NATIVE_TEXT_THRESHOLD:
+            logger.info("⚡ Page 1 has native text (%d chars), skipping OCR", native_chars)
+            # The probe already read page 1; only the remaining pages are extracted
+            page_texts = [first_page_text]
+            page_texts += extract_page_texts(pdf_path, pages_to_process, first_page=1)
+            ocr_results = _native_text_results(page_texts, "pymupdf")
+            if cache_key:
+                cache.put(cache_key, ocr_results)
+            return ocr_results
         
         # ========================================================================
         # STEP 1: FAST PATH - Process Page 1 IMMEDIATELY
         # ========================================================================
         try:
-            print(f"⚡ FAST PATH: Processing page 1 for immediate LLM submission...")
+            logger.debug("⚡ FAST PATH: Processing page 1 for immediate LLM submission...")
             ocr = get_ocr_reader()
             
-            page_1_data = _process_single_page(ocr, doc[0], 0, temp_dir)
+            # Pages of one invoice share a typeface, so page 1 sets the DPI for all
+            dpi = _choose_dpi(doc[0])
+            logger.debug("    Rendering at %d DPI", dpi)
+            
+            page_1_data = _process_single_page(ocr, doc[0], 0, dpi)
             
-            ocr_results["pages"].append(page_1_data)
-            ocr_results["full_text"] = f"--- PAGE 1 ---\n{page_1_data['text']}"
+            ocr_results["pages"][0] = page_1_data
+            ocr_results["_text_parts"][0] = f"--- PAGE 1 ---\n{page_1_data['text']}"
+            ocr_results["full_text"] = ocr_results["_text_parts"][0]
             
-            print(f"✅ Page 1 ready for LLM ({len(page_1_data['text'])} chars)")
+            logger.info("✅ Page 1 ready for LLM (%d chars)", len(page_1_data['text']))
             
             # ====================================================================
-            # STEP 2: BACKGROUND PATH - Spawn thread for pages 2-N
+            # STEP 2: BACKGROUND PATH - Hand pages 2-N to the OCR worker process
             # ====================================================================
+            # Submitted only once page 1 is done: the worker's PaddleOCR would otherwise
+            # compete with page-1 recognition for the same cores and delay the LLM
             if pages_to_process > 1:
-                print(f"🔄 Spawning background thread for pages 2-{pages_to_process}...")
+                logger.debug("🔄 Handing pages 2-%d to the background OCR process...", pages_to_process)
                 
-                # Create background thread
-                bg_thread = threading.Thread(
-                    target=_background_ocr_worker,
-                    args=(doc, ocr, 1, pages_to_process, temp_dir, ocr_results),
-                    daemon=True  # Allow main thread to exit even if background not done
-                )
-                bg_thread.start()
+                # One contiguous page range per worker, so each still batches its pages
+                n_ranges = min(max(1, OCRConfig.OCR_WORKERS), pages_to_process - 1)
+                step = -(-(pages_to_process - 1) // n_ranges)  # ceil division
+                ranges = [(start, min(start + step, pages_to_process))
+                          for start in range(1, pages_to_process, step)]
+                ocr_results["_pending_ranges"] = len(ranges)
                 
-                print(f"⚡ Returning page 1 immediately while background processes rest...")
+                executor = _get_background_executor()
+                for start, end in ranges:
+                    future = executor.submit(_background_ocr_worker, pdf_path, start, end, dpi)
+                    future.add_done_callback(
+                        lambda f, results=ocr_results: _collect_background_pages(f, results)
+                    )
             else:
                 ocr_results["background_complete"] = True
-                print(f"ℹ️ No background processing needed")
+                logger.debug("ℹ️ No background processing needed")
+            
+            # Multi-page results are cached by wait_for_background_ocr once complete
+            if cache_key:
+                if pages_to_process > 1:
+                    ocr_results["_cache_key"] = cache_key
+                else:
+                    cache.put(cache_key, ocr_results)
             
             return ocr_results
 
@@ -180,31 +520,18 @@ def perform_ocr(pdf_path: str, preprocess: bool = True, max_pages: int = None) -
         # FALLBACK: PyMuPDF if PaddleOCR fails
         # ====================================================================
         except Exception as e:
-            print(f"❌ PaddleOCR Failed: {type(e).__name__}: {e}")
-            print(f"⚠️ Falling back to PyMuPDF Native Extraction...")
-            
-            ocr_results = {
-                "method": "pymupdf_fallback",
-                "pages": [],
-                "total_pages": pages_to_process,
-                "full_text": "",
-                "background_complete": True  # Fallback is synchronous
-            }
-            all_text_parts = []
+            logger.error("❌ PaddleOCR Failed: %s: %s", type(e).__name__, e)
+            logger.warning("⚠️ Falling back to PyMuPDF Native Extraction...")
             
             try:
-                for i in range(pages_to_process):
-                    page_text = doc[i].get_text("text")
-                    page_data = {"page_num": i+1, "text": page_text, "blocks": []}
-                    ocr_results["pages"].append(page_data)
-                    all_text_parts.append(f"--- PAGE {i + 1} ---\n{page_text}")
-                
-                ocr_results["full_text"] = "\n\n".join(all_text_parts)
-                print(f"✅ Fallback successful.")
+                ocr_results = _native_text_results(
+                    extract_page_texts(pdf_path, pages_to_process), "pymupdf_fallback"
+                )
+                logger.info("✅ Fallback successful.")
                 return ocr_results
                 
             except Exception as fallback_error:
-                print(f"❌ Both methods failed: {fallback_error}")
+                logger.error("❌ Both methods failed: %s", fallback_error)
                 return {
                     "method": "error", 
                     "full_text": "", 
@@ -214,10 +541,9 @@ def perform_ocr(pdf_path: str, preprocess: bool = True, max_pages: int = None) -
                 }
     
     finally:
-        # NOTE: We do NOT close the doc here anymore since background thread needs it
-        # The background thread will handle cleanup when done
-        # gc.collect() will run periodically anyway
-        pass
+        # The background worker opens its own handle, so this one can always close
+        if doc is not None:
+            doc.close()
 
 
 def wait_for_background_ocr(ocr_results: Dict, timeout: float = 60.0) -> Dict:
@@ -231,11 +557,19 @@ def wait_for_background_ocr(ocr_results: Dict, timeout: float = 60.0) -> Dict:
     
     while not ocr_results.get("background_complete", False):
         if time.time() - start_time > timeout:
-            print(f"⚠️ Background OCR timeout after {timeout}s")
+            logger.warning("⚠️ Background OCR timeout after %ss", timeout)
             break
         time.sleep(0.1)
     
     if ocr_results.get("background_error"):
-        print(f"⚠️ Background OCR had errors: {ocr_results['background_error']}")
+        logger.warning("⚠️ Background OCR had errors: %s", ocr_results['background_error'])
+    
+    text_parts = ocr_results.get("_text_parts")
+    if text_parts:
+        ocr_results["full_text"] = "\n\n".join(p for p in text_parts if p)
+    
+    cache_key = ocr_results.pop("_cache_key", None)
+    if cache_key and ocr_results.get("background_complete") and not ocr_results.get("background_error"):
+        _get_result_cache().put(cache_key, ocr_results)
     
     return ocr_results
\ No newline at end of file
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class OCRCache:
+    """
+    Content-addressed cache of OCR results.
+
+    Entries are keyed by blake2b(pdf bytes) + the page limit + an OCR settings
+    version, so a retry or duplicate upload of the same invoice skips rendering
+    and PaddleOCR entirely, while any change to the models or render settings
+    misses the old entries. Results carry numpy box arrays, so entries are
+    pickled rather than JSON. Only public result fields are stored; keys starting
+    with "_" are in-flight bookkeeping. The directory is kept under ``max_bytes``
+    by evicting least recently used entries.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def file_key(pdf_path: str, max_pages: int, settings_version: str) -> str:
+        digest = hashlib.blake2b()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"{digest.hexdigest()}_{max_pages}_{settings_version}"
+
+    def get(self, key: str):
+        """Return the cached OCR results dict, or None on a miss"""
+        path = self.cache_dir / f"{key}.pkl"
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, ocr_results: dict):
+        path = self.cache_dir / f"{key}.pkl"
+        public = {k: v for k, v in ocr_results.items() if not k.startswith("_")}
+        tmp_path = None
+        try:
+            # A unique temp file per write: threads in one process can store the same key
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(public, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)  # Readers never see a half-written entry
+        except OSError as e:
+            logger.warning("⚠️ Could not write OCR cache entry: %s", e)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        self._prune()
+
+    def _prune(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
@@ -4,6 +4,7 @@ import json
 from pathlib import Path
 from datetime import datetime
 from app.utils.pdf_utils import pdf_to_images
+from app.services.sharepoint import get_tracker
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 validation_bp = Blueprint('validation', __name__)
@@ -218,10 +219,12 @@ def download_pdf(node_id):
 @validation_bp.route('/next_invoice', methods=['GET'])
 def get_next_invoice():
     """Get next unvalidated invoice that has been AI processed"""
-    sp_tracker = current_app.config['SHAREPOINT_TRACKER']
+    sp_tracker = get_tracker(current_app.config)
+    if not sp_tracker:
+        return jsonify({'error': 'SharePoint not connected'}), 500
     
     try:
-        all_items = sp_tracker.get_all_items()
+        all_items = sp_tracker.get_all_items_cached()
         
         # Find invoices that are AI processed but not human validated
         unvalidated = [
@@ -325,7 +328,9 @@ def get_invoice_page_count(node_id):
 @validation_bp.route('/save_validation', methods=['POST'])
 def save_validation():
     """Save human validation and mark as complete without overwriting AI fields"""
-    sp_tracker = current_app.config['SHAREPOINT_TRACKER']
+    sp_tracker = get_tracker(current_app.config)
+    if not sp_tracker:
+        return jsonify({'error': 'SharePoint not connected'}), 500
     
     data = request.json
     node_id = data.get('node_id')
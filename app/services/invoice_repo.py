@@ -121,7 +121,7 @@ class InvoiceRepository:
         """
         Get all invoices from SharePoint
         """
-        all_items = self.sp_tracker.get_all_items()
+        all_items = self.sp_tracker.get_all_items_cached()
         
         if not include_processed:
             # Filter for unprocessed only
@@ -3,11 +3,30 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from azure.identity import InteractiveBrowserCredential
 from typing import Dict, List, Optional
+import threading
 import time
 from datetime import datetime, timedelta
 
+from config import SharePointConfig
+
 GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
 
+
+def get_tracker(config, timeout: float = None) -> Optional["SharePointTracker"]:
+    """
+    Return the SharePoint tracker stored in a Flask config, waiting for the
+    background login started at app startup to finish first. Routes polled by
+    the UI should check SHAREPOINT_READY themselves rather than block here.
+    """
+    if timeout is None:
+        timeout = SharePointConfig.LOGIN_WAIT_TIMEOUT
+
+    ready = config.get("SHAREPOINT_READY")
+    if ready is not None:
+        ready.wait(timeout)
+    return config.get("SHAREPOINT_TRACKER")
+
+
 class SharePointTracker:
     def __init__(self, site_name: str, list_name: str, tenant_name: str):
         self.site_name = site_name
@@ -24,6 +43,13 @@ class SharePointTracker:
         # Cache State
         self.items_cache = None  # Stores all items from SharePoint
         self.filter_works = True  # Whether OData filtering is supported
+        self._items_snapshot = None  # Short-lived get_all_items() result for read-heavy routes
+        self._items_snapshot_at = 0.0
+        self._items_snapshot_lock = threading.Lock()
+
+        # Running list aggregates, seeded by one scan and kept current on every write
+        self.counters = None
+        self._counters_lock = threading.Lock()
         
         # --- NETWORK SETUP ---
         self.session = requests.Session()
@@ -102,6 +128,63 @@ class SharePointTracker:
         items = r.json().get("value", [])
         return [item["fields"] for item in items]
 
+    def get_all_items_cached(self, max_age: float = None) -> List[Dict]:
+        """
+        Like get_all_items(), but reuses the last download for up to max_age seconds.
+        Writes made through create_or_update_item() invalidate it. Returns a new
+        list each call, so callers can't mutate the shared snapshot.
+        """
+        if max_age is None:
+            max_age = SharePointConfig.ITEMS_CACHE_TTL
+
+        # Held across the download: concurrent requests that find the snapshot
+        # stale wait for one refresh instead of each downloading the whole list
+        with self._items_snapshot_lock:
+            now = time.monotonic()
+            if self._items_snapshot is None or now - self._items_snapshot_at > max_age:
+                self._items_snapshot = self.get_all_items()
+                self._items_snapshot_at = time.monotonic()
+                # Resync the running counters with edits made outside this process
+                self.refresh_counters(self._items_snapshot)
+            return list(self._items_snapshot)
+
+    def invalidate_items_cache(self):
+        """Drop the cached list items so the next read goes to SharePoint"""
+        with self._items_snapshot_lock:
+            self._items_snapshot = None
+
+    def refresh_counters(self, items: List[Dict] = None) -> Dict:
+        """Recount list aggregates from a full scan (pass items to reuse a download)"""
+        if items is None:
+            items = self.get_all_items()
+
+        counters = {
+            "total": len(items),
+            "ai_processed": sum(1 for i in items if i.get("AI_Processed")),
+            "human_validated": sum(1 for i in items if i.get("Human_Validated"))
+        }
+        with self._counters_lock:
+            self.counters = counters
+            return dict(counters)
+
+    def get_counters(self) -> Dict:
+        """Current list aggregates without rescanning the list"""
+        with self._counters_lock:
+            if self.counters is not None:
+                return dict(self.counters)
+        return self.refresh_counters()
+
+    def _update_counters(self, old_fields: Optional[Dict], new_fields: Dict):
+        """Apply one item write to the running aggregates"""
+        old_fields = old_fields or {}
+        with self._counters_lock:
+            if self.counters is None:
+                return
+            if not old_fields:
+                self.counters["total"] += 1
+            for counter, column in (("ai_processed", "AI_Processed"), ("human_validated", "Human_Validated")):
+                self.counters[counter] += bool(new_fields.get(column)) - bool(old_fields.get(column))
+
     def get_item_by_node_id(self, node_id: int) -> Optional[Dict]:
         """
         Optimized lookup - tries cache first, then filter, then full scan.
@@ -216,6 +299,9 @@ class SharePointTracker:
                 # Add to cache if it exists
                 if self.items_cache is not None:
                     self.items_cache.append(fields)
+
+            self.invalidate_items_cache()
+            self._update_counters(existing_item, fields)
                 
         except requests.exceptions.RetryError:
             print(f"❌ Max retries exceeded for NodeID {node_id}. Network is unstable.")
@@ -139,6 +139,7 @@ function toggleConsole() {
 
 async function fetchStats() {
     const res = await fetch('/sharepoint_stats');
+    if (res.status === 503) return;  // SharePoint login still in progress; keep polling
     const data = await res.json();
     
     const total = data.total || 0;
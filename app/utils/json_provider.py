@@ -0,0 +1,41 @@
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Every jsonify() response goes through this, so the invoice list and status
+    endpoints are serialized straight to bytes without the stdlib json encoder.
+    Types orjson doesn't know (Decimal, UUID, ...) fall back to Flask's default().
+    sort_keys and indent=2 map onto orjson options; any other json.dumps argument
+    falls back to the stdlib encoder so it is never silently ignored.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    sort_keys = False  # Key order is insertion order unless asked for
+
+    def _option(self, sort_keys: bool) -> int:
+        return self.option | orjson.OPT_SORT_KEYS if sort_keys else self.option
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop("sort_keys", self.sort_keys)
+        indent = kwargs.pop("indent", None)
+        if kwargs.keys() - {"default"} or indent not in (None, 2):
+            return super().dumps(obj, sort_keys=sort_keys, indent=indent, **kwargs)
+
+        option = self._option(sort_keys)
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._option(self.sort_keys)),
+            mimetype=self.mimetype
+        )
@@ -1,5 +1,4 @@
 import fitz  # PyMuPDF
-from PIL import Image
 import os
 
 def pdf_to_images(pdf_path, output_folder='temp', max_pages=None):
@@ -24,9 +23,24 @@ def pdf_to_images(pdf_path, output_folder='temp', max_pages=None):
         page = doc[i]
         pix = page.get_pixmap(dpi=150)  # Adjust DPI as needed
         img_path = os.path.join(output_folder, f"{base_name}_page_{i+1}.jpg")
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        img.save(img_path, "JPEG", quality=85)
+        # PyMuPDF's built-in JPEG encoder writes straight from the pixmap buffer,
+        # without copying the samples into a PIL image first
+        pix.save(img_path, jpg_quality=85)
         image_paths.append(img_path)
 
     doc.close()
-    return image_paths
\ No newline at end of file
+    return image_paths
+
+
+def extract_page_texts(pdf_path, page_count, first_page=0):
+    """
+    Extract native (non-OCR) text for pages ``first_page`` up to ``page_count``
+    of a PDF. Returns a list of page texts in page order.
+
+    Runs in the calling thread: native text extraction takes a few ms per page,
+    far less than starting worker processes (on Windows each one re-imports the app).
+    """
+    if page_count <= first_page:
+        return []
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text("text") for i in range(first_page, page_count)]
@@ -1,9 +1,21 @@
 class AIConfig:
     # Model Configuration
     MODEL_PATH = "mistral-7b.gguf"  # Your model filename
-    CTX_SIZE = 8192  # Context window size
-    MAX_TOKENS = 200  # Max tokens for extraction response
-    TEMPERATURE = 0.1  # Low temperature for deterministic extraction
+    CTX_SIZE = 4096  # Context window size (pages too dense to fit are sent as header + footer)
+    MAX_TOKENS = 128  # Max tokens for extraction response (the 4-field JSON needs ~60-80)
+    TEMPERATURE = 0.0  # Greedy decoding: deterministic, reproducible extraction
+    N_GPU_LAYERS = -1  # Layers offloaded to GPU (-1 = all, 0 = CPU only); ignored without GPU support
+    N_THREADS = None  # CPU threads for inference (None = all physical cores)
+    N_BATCH = 2048  # Logical batch size for prompt prefill
+    N_UBATCH = 512  # Physical micro-batch size per prefill matmul
+    QUANTIZE_KV_CACHE = True  # Store the KV cache as q8_0 (uses flash attention)
+    PREFIX_KV_CACHE = True  # Prefill the static prompt instructions once and reuse their KV cache
+    BATCH_SIZE = 4  # Invoices downloaded/OCR'd together before one batched LLM pass (only when LLM_POOL_SIZE > 1)
+    LLM_POOL_SIZE = 1  # Model contexts kept loaded; a batch runs this many invoices at once (cores are split between them)
+    USE_GRAMMAR = True  # Constrain decoding to the 4-key invoice JSON (GBNF grammar)
+    EXTRACTION_CACHE = True  # Reuse results for identical OCR text/model/prompt (app/cache/extraction)
+    EXTRACTION_CACHE_MEMORY_SIZE = 512  # Most recent cached results also kept in memory
+    DEBUG_SAVE_PROMPT = False  # Write each prompt to temp/prompt.txt for debugging
     
     # Text Slicing Configuration
     MAX_PAGE_CHARS = 8000  # Maximum characters before falling back to header+footer
@@ -106,11 +118,39 @@ class SharePointConfig:
     SP_SITE_NAME = "DataScience"                     # SharePoint site name
     SP_LIST_NAME = "invoiceverificationtestlist"     # List to interact with
     TENANT_NAME = "142gc.sharepoint.com"            # Tenant / domain
+    ITEMS_CACHE_TTL = 30                             # Seconds list reads are reused by status/next-invoice routes
+    LOGIN_WAIT_TIMEOUT = 300                         # Seconds a route waits for the background SharePoint login
 
 
 class OCRConfig:
     # Maximum pages that will be OCR'd per invoice
     MAX_OCR_PAGES = 1
+    # Worker processes OCR-ing pages 2-N in parallel (each loads its own PaddleOCR engine)
+    OCR_WORKERS = 1
+    # Page 1 native (embedded) text longer than this skips OCR entirely (digital PDFs)
+    NATIVE_TEXT_THRESHOLD = 50
+    # Reuse OCR results for byte-identical PDFs (retries, duplicate uploads; app/cache/ocr)
+    RESULT_CACHE = True
+    RESULT_CACHE_MAX_MB = 512  # Least recently used OCR results are evicted past this size
+    # PaddleOCR high-performance inference (OpenVINO/ONNX Runtime backends); needs
+    # 'paddleocr install_hpi_deps cpu', falls back to Paddle Inference without it
+    ENABLE_HPI = True
+    # Text line crops recognized per forward pass (a dense invoice page has 100+ lines)
+    REC_BATCH_SIZE = 16
+    OCR_BATCH_MEM_MB = 512  # Rendered-page memory per batched predict call (A4 at 300 DPI is ~25 MB)
+
+    # Render resolution. With ADAPTIVE_DPI, page 1 is first rendered at PROBE_DPI and
+    # text-detected; the DPI is then scaled so text lines are ~TARGET_TEXT_HEIGHT_PX tall
+    RENDER_DPI = 150  # Used when adaptive DPI is off or the probe finds no text
+    ADAPTIVE_DPI = True
+    PROBE_DPI = 100
+    TARGET_TEXT_HEIGHT_PX = 24
+    MIN_DPI = 120
+    MAX_DPI = 300
+    MAX_RENDER_SIDE_PX = 3600  # Longest rendered side; only large-format pages are capped (A4 at 300 DPI is 3508 px)
+    DET_MAX_SIDE_PX = 1600  # Longest side the text detector runs at; larger pages are downscaled for detection only
+    GRAYSCALE_RENDER = True  # Render pages in gray (turn off for colour-on-colour invoices)
+    SMALL_TEXT_HEIGHT_PX = 18  # Pages whose OCR'd lines are shorter than this are re-OCR'd at MAX_DPI
 
 
 class GCDocsConfig: